@@ -56,20 +56,15 @@ class document(tags.html):
     '''
     return self._entry.add(*args)
 
-  def render(self, *args, **kwargs):
+  def _render_root(self, write, indent, pretty, xhtml):
     '''
     Creates a <title> tag if not present and renders the DOCTYPE and tag tree.
     '''
-    r = []
-
     #Validates the tag tree and adds the doctype if one was set
     if self.doctype:
-      r.append(self.doctype)
-      r.append('\n')
-    r.append(super(document, self).render(*args, **kwargs))
-
-    return u''.join(r)
-  __str__ = __unicode__ = render
+      write(self.doctype)
+      write('\n')
+    super(document, self)._render_root(write, indent, pretty, xhtml)
 
   def __repr__(self):
     return '<dominate.document "%s">' % self.title
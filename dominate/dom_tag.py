@@ -20,9 +20,11 @@ Public License along with Dominate.  If not, see
 
 import copy
 import numbers
-from collections import defaultdict, namedtuple
+import sys
+from collections import namedtuple
 from functools import wraps
 import threading
+import weakref
 
 try:
   # Python 3
@@ -38,20 +40,106 @@ except NameError: # py3
   unicode = str
 
 
+# dicts keep insertion order from Python 3.7. There, attributes are kept
+# sorted as they are set, so rendering can skip sorting them. Older versions
+# keep plain dicts (OrderedDict is pure Python on Python 2) and sort at render.
+_ordered_dicts = sys.version_info >= (3, 7)
+
+# attribute values whose rendered fragment can not change between renders
+_immutable_types = (basestring, numbers.Number)
+
+
+try:
+  reversed({})
+except TypeError: # dicts can only be reversed from Python 3.8
+  def _last_key(d):
+    return list(d)[-1]
+else:
+  def _last_key(d):
+    return next(reversed(d))
+
+
 try:
   import greenlet
 except ImportError:
   greenlet = None
 
 
-def _get_thread_context():
-  context = [threading.current_thread()]
-  if greenlet:
-    context.append(greenlet.getcurrent())
-  return hash(tuple(context))
+_thread_local = threading.local()
+
+if greenlet is None:
+  def _get_thread_context():
+    # without greenlets the context only depends on the thread,
+    # so compute it once and remember it for the lifetime of the thread
+    try:
+      return _thread_local.context
+    except AttributeError:
+      context = _thread_local.context = hash(threading.current_thread())
+      return context
+
+else:
+  def _get_thread_context():
+    return hash((threading.current_thread(), greenlet.getcurrent()))
+
+
+# One entry per with-context active in any thread. Tags are usually built
+# without any, so checking this first skips looking up the stack entirely.
+# list.append() and list.pop() are atomic, unlike `+= 1` on a global count.
+_active_contexts = []
+
+
+# Stacks of with-context frames live on the thread-local, so finding the
+# current one is an attribute lookup rather than hashing a context key.
+if greenlet is None:
+  def _get_stack(create=False):
+    if create:
+      return _thread_local.__dict__.setdefault('stack', [])
+    return _thread_local.__dict__.get('stack')
+
+else:
+  def _get_stack(create=False):
+    # greenlets share the thread, so keep one stack per greenlet.
+    # stacks are dropped along with their greenlet
+    stacks = _thread_local.__dict__.get('stacks')
+    if stacks is None:
+      if not create:
+        return None
+      stacks = _thread_local.stacks = weakref.WeakKeyDictionary()
+    if create:
+      return stacks.setdefault(greenlet.getcurrent(), [])
+    return stacks.get(greenlet.getcurrent())
+
+
+class _indents(dict):
+  '''
+  Maps an indent level to a newline followed by that level of indentation.
+  The strings are built on first use, so rendering allocates one per depth
+  rather than one per tag.
+  '''
+  def __init__(self, indent_str):
+    super(_indents, self).__init__()
+    self.indent_str = indent_str
+
+  def __missing__(self, level):
+    indent = self[level] = '\n' + self.indent_str * level
+    return indent
+
+# shared between renders using the default indentation
+_default_indents = _indents('  ')
+
+def _get_indents(indent_str):
+  if indent_str == _default_indents.indent_str:
+    return _default_indents
+  return _indents(indent_str)
 
 
 class dom_tag(object):
+  # Per-instance state lives in slots. '__dict__' is kept so subclasses that
+  # do not declare __slots__ (all of the tags) and user code can still set
+  # arbitrary attributes; it stays empty unless something is stored in it.
+  __slots__ = ('attributes', '_attribute_cache', 'children', 'parent',
+      'document', '_ctx', '__dict__', '__weakref__')
+
   is_single = False  # Tag does not require matching end tag (ex. <hr/>)
   is_pretty = True   # Text inside the tag should be left as-is (ex. <pre>)
                      # otherwise, text will be escaped() and whitespace may be
@@ -92,10 +180,16 @@ class dom_tag(object):
     self.children   = []
     self.parent     = None
     self.document   = None
+    # attribute name -> (value, rendered ' key="value"' fragment),
+    # created on the first render with attributes
+    self._attribute_cache = None
 
     # Does not insert newlines on all children if True (recursive attribute)
-    self.is_inline = kwargs.pop('__inline', self.is_inline)
-    self.is_pretty = kwargs.pop('__pretty', self.is_pretty)
+    # Otherwise the class defaults are used
+    if '__inline' in kwargs:
+      self.is_inline = kwargs.pop('__inline')
+    if '__pretty' in kwargs:
+      self.is_pretty = kwargs.pop('__pretty')
 
     #Add child elements
     if args:
@@ -110,31 +204,31 @@ class dom_tag(object):
 
   # context manager
   frame = namedtuple('frame', ['tag', 'items', 'used'])
-  # stack of frames
-  _with_contexts = defaultdict(list)
 
   def _add_to_ctx(self):
-    stack = dom_tag._with_contexts.get(_get_thread_context())
+    if not _active_contexts:
+      return
+    stack = _get_stack()
     if stack:
       self._ctx = stack[-1]
       stack[-1].items.append(self)
 
 
   def __enter__(self):
-    stack = dom_tag._with_contexts[_get_thread_context()]
+    stack = _get_stack(create=True)
     stack.append(dom_tag.frame(self, [], set()))
+    _active_contexts.append(None)
     return self
 
 
   def __exit__(self, type, value, traceback):
-    thread_id = _get_thread_context()
-    stack = dom_tag._with_contexts[thread_id]
+    stack = _get_stack()
     frame = stack.pop()
-    for item in frame.items:
-      if item in frame.used: continue
-      self.add(item)
-    if not stack:
-      del dom_tag._with_contexts[thread_id]
+    _active_contexts.pop()
+    used = frame.used
+    unused = [item for item in frame.items if item not in used]
+    if unused:
+      self.add(*unused)
 
 
   def __call__(self, func):
@@ -161,9 +255,24 @@ class dom_tag(object):
     Add or update the value of an attribute.
     '''
     if isinstance(key, int):
+      if not isinstance(value, dom_tag):
+        value = unicode(value)
       self.children[key] = value
     elif isinstance(key, basestring):
-      self.attributes[key] = value
+      attributes = self.attributes
+      if key in attributes or not _ordered_dicts:
+        attributes[key] = value
+        return
+
+      # Keep attributes sorted by name so render() does not have to
+      # sort them every time. Attributes are usually set in order, in which
+      # case the new one can simply be appended.
+      sort = attributes and key < _last_key(attributes)
+      attributes[key] = value
+      if sort:
+        items = sorted(attributes.items())
+        attributes.clear()
+        attributes.update(items)
     else:
       raise TypeError('Only integer and string types are valid for assigning '
           'child tags and attributes, respectively.')
@@ -182,10 +291,10 @@ class dom_tag(object):
     validation.
     '''
     # assume that a document is correct in the subtree
-    if self.document != doc:
+    if self.document is not doc:
       self.document = doc
       for i in self.children:
-        if not isinstance(i, dom_tag): return
+        if not isinstance(i, dom_tag): continue
         i.setdocument(doc)
 
 
@@ -193,30 +302,61 @@ class dom_tag(object):
     '''
     Add new child tags.
     '''
-    for obj in args:
-      if isinstance(obj, numbers.Number):
-        # Convert to string so we fall into next if block
-        obj = str(obj)
-
-      if isinstance(obj, basestring):
-        obj = escape(obj)
+    # Fast path for the most common call: a single tag or string
+    if len(args) == 1:
+      obj = args[0]
+      if isinstance(obj, dom_tag):
+        if _active_contexts:
+          stack = _get_stack()
+          if stack:
+            stack[-1].used.add(obj)
         self.children.append(obj)
+        obj.parent = self
+        if obj.document is not self.document:
+          obj.setdocument(self.document)
+        return obj
+      if isinstance(obj, basestring):
+        self.children.append(escape(obj))
+        return obj
 
-      elif isinstance(obj, dom_tag):
-        stack = dom_tag._with_contexts.get(_get_thread_context())
-        if stack:
-          stack[-1].used.add(obj)
-        self.children.append(obj)
+    # tags added here should not also be added by an enclosing with context
+    stack = _get_stack() if _active_contexts else None
+    used = stack[-1].used if stack else None
+
+    children = self.children
+    # local names are faster to look up than globals inside the loop
+    _isinstance = isinstance
+    _basestring = basestring
+    _dom_tag = dom_tag
+    _escape = escape
+
+    for obj in args:
+      # Text is checked first since it is the most common argument, and
+      # numbers.Number is a comparatively slow abstract base class check
+      if _isinstance(obj, _basestring):
+        children.append(_escape(obj))
+
+      elif _isinstance(obj, _dom_tag):
+        if used is not None:
+          used.add(obj)
+        children.append(obj)
         obj.parent = self
-        obj.setdocument(self.document)
+        # Attaching a subtree to a different document needs a full walk,
+        # but the common case (building a detached tree) needs none
+        if obj.document is not self.document:
+          obj.setdocument(self.document)
+
+      elif _isinstance(obj, numbers.Number):
+        children.append(_escape(str(obj)))
 
-      elif isinstance(obj, dict):
+      elif _isinstance(obj, dict):
         for attr, value in obj.items():
           self.set_attribute(*dom_tag.clean_pair(attr, value))
 
       elif hasattr(obj, '__iter__'):
-        for subobj in obj:
-          self.add(subobj)
+        # Add the whole iterable at once, rather than one call per item,
+        # so the setup above runs once for a run of strings or tags
+        self.add(*obj)
 
       else:  # wtf is it?
         raise ValueError('%r not a tag or string.' % obj)
@@ -228,7 +368,8 @@ class dom_tag(object):
 
 
   def add_raw_string(self, s):
-    self.children.append(s)
+    # children are written as-is by render(), so make sure this is a string
+    self.children.append(unicode(s))
 
 
   def remove(self, obj):
@@ -242,6 +383,24 @@ class dom_tag(object):
     self.children = []
 
 
+  def freeze(self):
+    '''
+    Replaces this tag in its parent with a node that renders it once and
+    then reuses the cached output. Use this for subtrees that are rendered
+    many times but never change; changes made after freezing are ignored.
+    Returns the frozen node.
+    '''
+    parent = self.parent
+    node = frozen(self)
+    if parent is not None:
+      parent.children[parent.children.index(self)] = node
+      node.parent = parent
+      # already in place, so don't let an enclosing with context add it
+      if node._ctx:
+        node._ctx.used.add(node)
+    return node
+
+
   def get(self, tag=None, **kwargs):
     '''
     Recursively searches children for tags of a certain
@@ -253,19 +412,26 @@ class dom_tag(object):
     attrs = [(dom_tag.clean_attribute(attr), value)
         for attr, value in kwargs.items()]
 
+    tag_is_str = isinstance(tag, basestring)
+
     results = []
-    for child in self.children:
-      if (isinstance(tag, basestring) and type(child).__name__ == tag) or \
-        (not isinstance(tag, basestring) and isinstance(child, tag)):
+    results_append = results.append
+    # Walk the tree with an explicit stack rather than recursing, visiting
+    # children in document order
+    stack = self.children[::-1]
+    while stack:
+      child = stack.pop()
+      if (tag_is_str and type(child).__name__ == tag) or \
+        (not tag_is_str and isinstance(child, tag)):
 
         if all(child.attributes.get(attribute) == value
             for attribute, value in attrs):
           # If the child is of correct type and has all attributes and values
           # in kwargs add as a result
-          results.append(child)
+          results_append(child)
       if isinstance(child, dom_tag):
         # If the child is a dom_tag extend the search down through its children
-        results.extend(child.get(tag, **kwargs))
+        stack.extend(child.children[::-1])
     return results
 
 
@@ -336,59 +502,148 @@ class dom_tag(object):
 
 
   def render(self, indent='  ', pretty=True, xhtml=False):
-    data = self._render([], 0, indent, pretty, xhtml)
-    return u''.join(data)
+    sb = []
+    self._render_root(sb.append, indent, pretty, xhtml)
+    return u''.join(sb)
 
 
-  def _render(self, sb, indent_level, indent_str, pretty, xhtml):
-    pretty = pretty and self.is_pretty
+  def render_to(self, fp, indent='  ', pretty=True, xhtml=False):
+    '''
+    Renders straight to `fp`, any object with a text `write` method, without
+    building the whole string in memory first. On Python 2 `fp` must also
+    accept native `str`, so use StringIO.StringIO rather than io.StringIO.
+    If rendering fails, part of the output may already have been written.
+    '''
+    self._render_root(fp.write, indent, pretty, xhtml)
 
-    name = getattr(self, 'tagname', type(self).__name__)
 
-    # Workaround for python keywords and standard classes/methods
-    # (del, object, input)
-    if name[-1] == '_':
-      name = name[:-1]
+  def _render_root(self, write, indent, pretty, xhtml):
+    self._render(write, 0, _get_indents(indent), pretty, xhtml)
 
-    # open tag
-    sb.append('<')
-    sb.append(name)
 
-    for attribute, value in sorted(self.attributes.items()):
-      if value is not False: # False values must be omitted completely
-          sb.append(' %s="%s"' % (attribute, escape(unicode(value), True)))
+  def _render(self, write, indent_level, indents, pretty, xhtml):
+    pretty = pretty and self.is_pretty
+
+    open_start, open_tag, open_single, close = self._tag_fragments()
+    single = self.is_single and xhtml
 
-    sb.append(' />' if self.is_single and xhtml else '>')
+    # open tag
+    attributes = self.attributes
+    if attributes:
+      write(open_start)
+
+      attributes = attributes.items()
+      if not _ordered_dicts:
+        attributes = sorted(attributes)
+
+      cache = self._attribute_cache
+      if cache is None:
+        cache = self._attribute_cache = {}
+
+      for attribute, value in attributes:
+        # Reuse the escaped fragment from the last render while the value is
+        # the same immutable object. Other values may have changed in place,
+        # so they are escaped every time.
+        cached = cache.get(attribute)
+        if cached is not None and cached[0] is value:
+          write(cached[1])
+          continue
+
+        if value is False: # False values must be omitted completely
+          fragment = ''
+        else:
+          fragment = ' %s="%s"' % (attribute, escape(unicode(value), True))
+        if isinstance(value, _immutable_types):
+          cache[attribute] = (value, fragment)
+        write(fragment)
+
+      write(' />' if single else '>')
+    else:
+      write(open_single if single else open_tag)
 
     if not self.is_single:
-      inline = self._render_children(sb, indent_level + 1, indent_str, pretty, xhtml)
+      inline = self._render_children(write, indent_level + 1, indents, pretty, xhtml)
 
       if pretty and not inline:
-        sb.append('\n')
-        sb.append(indent_str * indent_level)
+        write(indents[indent_level])
 
       # close tag
-      sb.append('</')
-      sb.append(name)
-      sb.append('>')
+      write(close)
 
-    return sb
+  @classmethod
+  def _tag_fragments(cls):
+    '''
+    Returns the rendered tag fragments for this class: the start of the
+    opening tag, the complete opening tag without attributes (normal and
+    xhtml self-closing) and the closing tag.
+    These are computed on first use and cached on the class itself.
+    '''
+    fragments = cls.__dict__.get('_fragments')
+    if fragments is None:
+      name = getattr(cls, 'tagname', cls.__name__)
+
+      # Workaround for python keywords and standard classes/methods
+      # (del, object, input)
+      if name[-1] == '_':
+        name = name[:-1]
+
+      fragments = ('<' + name, '<' + name + '>', '<' + name + ' />',
+          '</' + name + '>')
+      cls._fragments = fragments
+    return fragments
+
+  def _render_children(self, write, indent_level, indents, pretty, xhtml):
+    # local names are faster to look up than globals inside the loops
+    _isinstance = isinstance
+    _dom_tag = dom_tag
+
+    if not pretty:
+      for child in self.children:
+        if _isinstance(child, _dom_tag):
+          child._render(write, indent_level, indents, pretty, xhtml)
+        else:
+          write(child)
+      return True
 
-  def _render_children(self, sb, indent_level, indent_str, pretty, xhtml):
     inline = True
+    indent = indents[indent_level]
     for child in self.children:
-      if isinstance(child, dom_tag):
-        if pretty and not child.is_inline:
+      if _isinstance(child, _dom_tag):
+        if not child.is_inline:
           inline = False
-          sb.append('\n')
-          sb.append(indent_str * indent_level)
-        child._render(sb, indent_level, indent_str, pretty, xhtml)
+          write(indent)
+        child._render(write, indent_level, indents, pretty, xhtml)
       else:
-        sb.append(unicode(child))
+        write(child)
 
     return inline
 
 
+  # Pickling protocols 0 and 1 (the default on Python 2) can not handle
+  # __slots__ on their own, so save slots and __dict__ together
+  def __getstate__(self):
+    state = dict(self.__dict__)
+    for cls in type(self).__mro__:
+      for name in cls.__dict__.get('__slots__', ()):
+        if name in ('__dict__', '__weakref__'):
+          continue
+        try:
+          state[name] = object.__getattribute__(self, name)
+        except AttributeError:
+          pass
+    return state
+
+  def __setstate__(self, state):
+    slots = set()
+    for cls in type(self).__mro__:
+      slots.update(cls.__dict__.get('__slots__', ()))
+    for name, value in state.items():
+      if name in slots:
+        object.__setattr__(self, name, value)
+      else:
+        self.__dict__[name] = value
+
+
   def __repr__(self):
     name = '%s.%s' % (self.__module__, type(self).__name__)
 
@@ -409,7 +664,18 @@ class dom_tag(object):
     Normalize attribute names for shorthand and work arounds for limitations
     in Python's syntax
     '''
+    # The same few attribute names are cleaned over and over, so remember
+    # the results. The cache is capped in case names come from user data.
+    cleaned = _clean_attribute_cache.get(attribute)
+    if cleaned is None:
+      cleaned = dom_tag._clean_attribute(attribute)
+      if len(_clean_attribute_cache) < _CLEAN_ATTRIBUTE_CACHE_SIZE:
+        _clean_attribute_cache[attribute] = cleaned
+    return cleaned
+
 
+  @staticmethod
+  def _clean_attribute(attribute):
     # Shorthand
     attribute = {
       'cls': 'class',
@@ -456,14 +722,17 @@ class dom_tag(object):
     return (attribute, value)
 
 
+_CLEAN_ATTRIBUTE_CACHE_SIZE = 4096
+_clean_attribute_cache = {}
+
+
 _get_current_none = object()
 def get_current(default=_get_current_none):
   '''
   get the current tag being used as a with context or decorated function.
   if no context is active, raises ValueError, or returns the default, if provided
   '''
-  h = _get_thread_context()
-  ctx = dom_tag._with_contexts.get(h, None)
+  ctx = _get_stack() if _active_contexts else None
   if ctx:
     return ctx[-1].tag
   if default is _get_current_none:
@@ -482,5 +751,5 @@ def attr(*args, **kwargs):
       c.set_attribute(*dom_tag.clean_pair(attr, value))
 
 
-# escape() is used in render
-from .util import escape
+# escape() is used in render, frozen in freeze
+from .util import escape, frozen
@@ -18,7 +18,7 @@ You should have received a copy of the GNU Lesser General
 Public License along with Dominate.  If not, see
 <http://www.gnu.org/licenses/>.
 '''
-from .dom_tag  import dom_tag, attr, get_current
+from .dom_tag  import dom_tag, attr, get_current, _default_indents
 from .dom1core import dom1core
 
 try:
@@ -1103,28 +1103,25 @@ class comment(html_tag):
   # Valid values are 'hidden', 'downlevel' or 'revealed'
   ATTRIBUTE_DOWNLEVEL = 'downlevel'
 
-  def _render(self, sb, indent_level=1, indent_str='  ', pretty=True, xhtml=False):
+  def _render(self, write, indent_level=1, indents=_default_indents, pretty=True, xhtml=False):
     has_condition = comment.ATTRIBUTE_CONDITION in self.attributes
     is_revealed   = comment.ATTRIBUTE_DOWNLEVEL in self.attributes and \
         self.attributes[comment.ATTRIBUTE_DOWNLEVEL] == 'revealed'
 
-    sb.append('<!')
+    write('<!')
     if not is_revealed:
-      sb.append('--')
+      write('--')
     if has_condition:
-      sb.append('[if %s]>' % self.attributes[comment.ATTRIBUTE_CONDITION])
+      write('[if %s]>' % self.attributes[comment.ATTRIBUTE_CONDITION])
 
-    pretty = self._render_children(sb, indent_level - 1, indent_str, pretty, xhtml)
+    pretty = self._render_children(write, indent_level - 1, indents, pretty, xhtml)
 
     # if len(self.children) > 1:
     if any(isinstance(child, dom_tag) for child in self):
-      sb.append('\n')
-      sb.append(indent_str * (indent_level - 1))
+      write(indents[indent_level - 1])
 
     if has_condition:
-      sb.append('<![endif]')
+      write('<![endif]')
     if not is_revealed:
-      sb.append('--')
-    sb.append('>')
-
-    return sb
+      write('--')
+    write('>')
@@ -17,6 +17,7 @@ Public License along with dominate.  If not, see
 '''
 # pylint: disable=bad-whitespace
 
+import os
 from setuptools import setup
 
 import imp
@@ -24,6 +25,22 @@ _version = imp.load_source("dominate._version", "dominate/_version.py")
 
 long_description = open('README.md').read()
 
+# Optionally compile the rendering hot path with Cython.
+# The modules stay plain Python, so this is purely a speedup and the
+# pure Python package keeps working without a compiler.
+ext_modules = []
+if os.environ.get('DOMINATE_CYTHON'):
+  try:
+    from Cython.Build import cythonize
+  except ImportError:
+    raise SystemExit('DOMINATE_CYTHON is set but Cython is not installed in '
+      'the build environment. Install Cython and build with '
+      '`pip install --no-build-isolation .`')
+  ext_modules = cythonize(
+    ['dominate/dom_tag.py', 'dominate/util.py'],
+    compiler_directives={'language_level': 3},
+  )
+
 setup(
   name    = 'dominate',
   version = _version.__version__,
@@ -59,4 +76,5 @@ setup(
 
   packages = ['dominate'],
   include_package_data = True,
+  ext_modules = ext_modules,
 )
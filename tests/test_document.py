@@ -71,6 +71,28 @@ def test_title():
 </html>'''
 
 
+def test_setdocument():
+  d = document()
+  tree = div('text', span(), p(b()))
+  tree.setdocument(d)
+  assert tree[1].document is d
+  assert tree[2][0].document is d
+  tree.add(i())
+  assert tree[3].document is d
+
+
+def test_render_to():
+  try:
+    from StringIO import StringIO
+  except ImportError:
+    from io import StringIO
+  d = document()
+  fp = StringIO()
+  d.render_to(fp)
+  assert fp.getvalue() == d.render() == str(d)
+  assert fp.getvalue().startswith('<!DOCTYPE html>\n<html>')
+
+
 if __name__ == '__main__':
   # test_doc()
   test_decorator()
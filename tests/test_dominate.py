@@ -16,3 +16,12 @@ def test_context():
   id2 = dominate.dom_tag._get_thread_context()
   assert id1 == id2
 
+
+
+def test_context_threads():
+  import threading
+  ids = []
+  t = threading.Thread(target=lambda: ids.append(dominate.dom_tag._get_thread_context()))
+  t.start()
+  t.join()
+  assert ids[0] != dominate.dom_tag._get_thread_context()
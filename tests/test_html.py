@@ -219,6 +219,50 @@ def test_attributes():
     attr(id='moo')
 
 
+def test_attribute_order():
+  d = div(id='foo')
+  d['title'] = 'bar'
+  d['class'] = 'baz'
+  d['id'] = 'qux'
+  assert d.render() == '<div class="baz" id="qux" title="bar"></div>'
+
+  d['class'] = False
+  assert d.render() == '<div id="qux" title="bar"></div>'
+  d['class'] = '"a"'
+  del d['title']
+  assert d.render() == '<div class="&quot;a&quot;" id="qux"></div>'
+
+
+def test_attributes_direct():
+  # tag.attributes is the source of truth, even when changed directly
+  d = div(id='a')
+  assert d.render() == '<div id="a"></div>'
+  d.attributes.pop('id')
+  d.attributes['title'] = 'x'
+  assert d.render() == '<div title="x"></div>'
+  d.attributes.update({'title': '<y>', 'data-z': False})
+  assert d.render() == '<div title="&lt;y&gt;"></div>'
+  d.attributes.clear()
+  assert d.render() == '<div></div>'
+
+
+def test_attributes_mutable():
+  l = ['x']
+  d = div(title=l)
+  assert d.render() == '<div title="[\'x\']"></div>'
+  l.append('y')
+  assert d.render() == '<div title="[\'x\', \'y\']"></div>'
+
+  class counter(object):
+    n = 0
+    def __str__(self):
+      self.n += 1
+      return str(self.n)
+  d = div(title=counter())
+  assert d.render() == '<div title="1"></div>'
+  assert d.render() == '<div title="2"></div>'
+
+
 def test_attribute_dashes():
   # fix issue #118 (https://github.com/Knio/dominate/issues/118)
   expected = '<div aria-foo="bar" data-a-b-c="foo" data-page-size="123"></div>'
@@ -335,3 +379,128 @@ def test_xhtml():
 
   assert span('hi', br(), 'there').render(xhtml=False) == \
          '''<span>hi<br>there</span>'''
+
+
+def test_tagname():
+  class custom(div):
+    pass
+
+  class custom_(custom):
+    tagname = 'my-tag_'
+
+  assert div().render() == '<div></div>'
+  assert custom().render() == '<custom></custom>'
+  assert custom_().render() == '<my-tag></my-tag>'
+  assert del_().render() == '<del></del>'
+
+
+def test_get():
+  d = div(p(span('a'), id='x'), span('b'), p(id='y'))
+  assert d.get('span') == [d[0][0], d[1]]
+  assert d.get(p) == [d[0], d[2]]
+  assert d.get(p, id='y') == [d[2]]
+
+  # deep trees do not hit the recursion limit
+  import sys
+  root = tag = div()
+  for _ in xrange(sys.getrecursionlimit() + 10):
+    tag = tag.add(div())
+  tag.add(span(id='leaf'))
+  assert len(root.get(span, id='leaf')) == 1
+
+
+def test_raw_children():
+  d = div()
+  d.add_raw_string(1)
+  d += 'a'
+  d[1] = 2
+  assert d.render() == '<div>12</div>'
+
+
+def test_context_manager_threads():
+  import threading
+  results = []
+
+  def build():
+    with div() as d:
+      p('thread')
+    results.append(d)
+
+  with span() as s:
+    t = threading.Thread(target=build)
+    t.start()
+    t.join()
+    b('main')
+
+  assert s.render(pretty=False) == '<span><b>main</b></span>'
+  assert results[0].render(pretty=False) == '<div><p>thread</p></div>'
+
+
+def test_pickle():
+  import pickle
+  from dominate import document
+  from dominate.util import text
+  d = div(span('a', __inline=False), text('<b>', escape=False), id='x')
+  d.custom = 1
+  doc = document(title='t')
+  doc += p('hi')
+  for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+    copy = pickle.loads(pickle.dumps(d, protocol))
+    assert copy.render() == d.render()
+    assert copy.custom == 1
+    assert copy[0].parent is copy
+    assert copy[0].is_inline is False
+    assert pickle.loads(pickle.dumps(doc, protocol)).render() == doc.render()
+
+
+def test_context_manager_active_count():
+  from dominate import dom_tag
+  assert not dom_tag._active_contexts
+  with div():
+    with p():
+      assert len(dom_tag._active_contexts) == 2
+    with pytest.raises(RuntimeError):
+      with span():
+        raise RuntimeError
+  assert not dom_tag._active_contexts
+  assert not span().parent
+
+
+def test_freeze():
+  d = div(p('a'), span('b'))
+  expected = d.render()
+  node = d[0].freeze()
+  assert d[0] is node
+  assert node.parent is d
+  assert d.render() == expected
+  assert d.render(pretty=False) == '<div><p>a</p><span>b</span></div>'
+
+  # changes after freezing are not rendered
+  node[0].add('c')
+  assert d.render() == expected
+
+  with div() as d:
+    s = span('x')
+    s.freeze()
+  assert d.render(pretty=False) == '<div><span>x</span></div>'
+
+  with div() as d:
+    with p() as q:
+      pass
+    q.freeze()
+  assert d.render(pretty=False) == '<div><p></p></div>'
+
+
+def test_render_to():
+  try:
+    from StringIO import StringIO
+  except ImportError:
+    from io import StringIO
+  d = div(p('a'), id='x')
+  fp = StringIO()
+  d.render_to(fp)
+  assert fp.getvalue() == d.render()
+
+  fp = StringIO()
+  d.render_to(fp, pretty=False)
+  assert fp.getvalue() == '<div id="x"><p>a</p></div>'
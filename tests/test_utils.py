@@ -30,8 +30,11 @@ def test_system():
 
 def test_unescape():
   assert util.unescape('&amp;&lt;&gt;&#32;') == '&<> '
+  assert util.unescape('a &bogus; b &#65;&x') == 'a ? b A&x'
 
 
 def test_url():
   assert util.url_escape('hi there?') == 'hi%20there%3F'
   assert util.url_unescape('hi%20there%3f') == 'hi there?'
+  assert util.url_escape(u'a/b\u00e9%') == u'a%2Fb\u00e9%'
+  assert util.url_unescape('%e9%zz') == u'\u00e9%zz'